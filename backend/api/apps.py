@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'  # Ovo ime mora da se poklapa sa onim u INSTALLED_APPS
\ No newline at end of file
+    name = 'api'  # Ovo ime mora da se poklapa sa onim u INSTALLED_APPS
+
+    def ready(self):
+        # Registracija signala za invalidaciju keša korisnika i vlasništva
+        from . import signals  # noqa: F401
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User, Folder, Chat
+
+# Kratki TTL-ovi: LocMem keš je po procesu, pa invalidacija preko signala
+# stiže samo do procesa u kome je promena napravljena. Ostali workeri
+# vide svežu vrednost najkasnije nakon isteka TTL-a.
+USER_KEY = 'auth_user:{}'
+FOLDER_OWNER_KEY = 'folder_owner:{}'
+CHAT_FOLDER_KEY = 'chat_folder:{}'
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_cached_user(user_id):
+    """
+    Vraća User objekat iz keša ili iz baze (None ako ne postoji). user_id je vrednost
+    polja SIMPLE_JWT USER_ID_FIELD iz tokena, isto kao u JWTAuthentication.get_user.
+    """
+    key = USER_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TTL)
+    return user
+
+
+def _folder_owner_id(folder_id):
+    key = FOLDER_OWNER_KEY.format(folder_id)
+    owner_id = cache.get(key)
+    if owner_id is None:
+        owner_id = Folder.objects.filter(pk=folder_id).values_list('user_id', flat=True).first()
+        if owner_id is not None:
+            cache.set(key, owner_id, settings.OWNERSHIP_CACHE_TTL)
+    return owner_id
+
+
+def user_owns_folder(user, folder_id):
+    """Proverava da li folder pripada korisniku, bez JOIN-a kada je keš topao."""
+    folder_id = _to_id(folder_id)
+    if folder_id is None:
+        return False
+    return _folder_owner_id(folder_id) == user.pk
+
+
+def user_owns_chat(user, chat_id):
+    """Proverava da li chat (preko svog foldera) pripada korisniku."""
+    chat_id = _to_id(chat_id)
+    if chat_id is None:
+        return False
+
+    key = CHAT_FOLDER_KEY.format(chat_id)
+    folder_id = cache.get(key)
+    if folder_id is None:
+        # Hladan keš: jednim upitom punimo i chat -> folder i folder -> user
+        row = Chat.objects.filter(pk=chat_id).values_list('folder_id', 'folder__user_id').first()
+        if row is None:
+            return False
+        folder_id, owner_id = row
+        cache.set(key, folder_id, settings.OWNERSHIP_CACHE_TTL)
+        cache.set(FOLDER_OWNER_KEY.format(folder_id), owner_id, settings.OWNERSHIP_CACHE_TTL)
+        return owner_id == user.pk
+
+    return _folder_owner_id(folder_id) == user.pk
+
+
+def invalidate_user(user):
+    cache.delete(USER_KEY.format(getattr(user, api_settings.USER_ID_FIELD)))
+
+
+def invalidate_folder(folder_id):
+    cache.delete(FOLDER_OWNER_KEY.format(folder_id))
+
+
+def invalidate_chat(chat_id):
+    cache.delete(CHAT_FOLDER_KEY.format(chat_id))
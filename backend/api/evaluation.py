@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .rag_service import (
+    RERANK_CANDIDATES, build_context, build_prompt, estimate_tokens, normalize_text, rerank, split_chunks,
+)
+from .vector_store import embed_texts, embedding_model_id
+
+
+@dataclass(frozen=True)
+class EvalConfig:
+    """Jedna tačka u mreži konfiguracija RAG-a."""
+    chunk_size: int = 800
+    chunk_overlap: int = 0
+    k: int = 3
+    rerank: bool = False
+    prompt_budget: int = 0
+
+    @property
+    def chunker(self):
+        return self.chunk_size, self.chunk_overlap
+
+    @property
+    def label(self):
+        return (f"chunk={self.chunk_size}/{self.chunk_overlap} k={self.k} "
+                f"rerank={'on' if self.rerank else 'off'} budget={self.prompt_budget or '-'}")
+
+
+def load_questions(path):
+    """JSONL: {"question": "...", "expected_articles": ["Član 179", ...]} po liniji."""
+    questions = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                questions.append({'question': row['question'], 'expected_articles': row.get('expected_articles', [])})
+    return questions
+
+
+def contains_expected(text, expected_articles):
+    """Da li tekst sadrži bar jedan od očekivanih članova (bez obzira na velika slova i dijakritike)."""
+    text = ' '.join(normalize_text(text).split())
+    for article in expected_articles:
+        pattern = r'\b' + re.escape(' '.join(normalize_text(article).split())) + r'\b'
+        if re.search(pattern, text):
+            return True
+    return False
+
+
+def _normalize_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+class EmbeddingCache:
+    """
+    Embedding-i na disku po SHA-1 teksta, da ponovljene evaluacije ne pokreću model iznova.
+    Keš važi samo za model sa kojim je napravljen (model_id); za drugi model počinje iz početka.
+    """
+
+    def __init__(self, path, embed_function=embed_texts, model_id=None):
+        self.path = path
+        self.embed_function = embed_function
+        if model_id is None:
+            model_id = (embedding_model_id() if embed_function is embed_texts
+                        else f"{embed_function.__module__}.{embed_function.__qualname__}")
+        self.model_id = model_id
+        os.makedirs(path, exist_ok=True)
+        self.index = {}
+        self.vectors = None
+        keys_file = os.path.join(path, 'keys.json')
+        if os.path.exists(keys_file):
+            with open(keys_file) as f:
+                stored = json.load(f)
+            # Stari format (samo lista ključeva) nema model, pa se ne koristi
+            if isinstance(stored, dict) and stored.get('model') == model_id:
+                self.index = {key: row for row, key in enumerate(stored['keys'])}
+                self.vectors = np.load(os.path.join(path, 'vectors.npy'))
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def embed(self, texts):
+        keys = [self._key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new = np.asarray(self.embed_function(list(missing.values())), dtype=np.float32)
+            start = len(self.index)
+            self.vectors = new if self.vectors is None else np.vstack([self.vectors, new])
+            for offset, key in enumerate(missing):
+                self.index[key] = start + offset
+            self.save()
+
+        return self.vectors[[self.index[key] for key in keys]]
+
+    def save(self):
+        np.save(os.path.join(self.path, 'vectors.npy'), self.vectors)
+        with open(os.path.join(self.path, 'keys.json'), 'w') as f:
+            json.dump({'model': self.model_id, 'keys': sorted(self.index, key=self.index.get)}, f)
+
+
+class FakeLLM:
+    """
+    Deterministički LLM: odgovor zavisi samo od prompta, bez mreže. Latencija generisanja
+    se ne čeka nego računa kao base_ms + ms_per_token * tokeni prompta.
+    """
+
+    def __init__(self, base_ms=0.0, ms_per_token=0.0):
+        self.base_ms = base_ms
+        self.ms_per_token = ms_per_token
+
+    def generate(self, prompt):
+        latency = (self.base_ms + self.ms_per_token * estimate_tokens(prompt)) / 1000
+        return f"[fake] {hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]}", latency
+
+
+class RecordedLLM:
+    """
+    Reprodukuje ranije snimljene odgovore i latencije (JSONL po SHA-1 prompta).
+    Ako je zadat model, promptovi bez snimka se šalju modelu i dopisuju u fajl.
+    """
+
+    def __init__(self, path, model=None):
+        self.path = path
+        self.model = model
+        self.recordings = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self.recordings[row['prompt_sha1']] = row
+
+    def generate(self, prompt):
+        key = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+        if key not in self.recordings:
+            if self.model is None:
+                raise KeyError(f"Nema snimljenog odgovora za prompt {key}; pokrenite sa --record")
+            started = time.perf_counter()
+            answer = self.model.generate_content(prompt).text
+            row = {'prompt_sha1': key, 'answer': answer, 'latency': time.perf_counter() - started}
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            self.recordings[key] = row
+        row = self.recordings[key]
+        return row['answer'], row['latency']
+
+
+def evaluate_config(config, chunks, matrix, questions, question_vectors, llm):
+    """Pokreće pretragu, reranking, prompt i (lažno/snimljeno) generisanje za svako pitanje."""
+    latencies, tokens = [], []
+    hits = prompt_hits = 0
+    for question, q in zip(questions, question_vectors):
+        started = time.perf_counter()
+        n = min(len(chunks), config.k * RERANK_CANDIDATES if config.rerank else config.k)
+        scores = matrix @ q
+        top = np.argpartition(-scores, n - 1)[:n]
+        documents = [chunks[i] for i in top[np.argsort(-scores[top])]]
+        if config.rerank:
+            documents = rerank(question['question'], documents)[:config.k]
+        context = build_context(documents, config.prompt_budget)
+        prompt = build_prompt(question['question'], context)
+        retrieval = time.perf_counter() - started
+
+        _, generation = llm.generate(prompt)
+        latencies.append(1000 * (retrieval + generation))
+        tokens.append(estimate_tokens(prompt))
+        hits += contains_expected(' '.join(documents), question['expected_articles'])
+        prompt_hits += contains_expected(context, question['expected_articles'])
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'config': config.label,
+        'chunk_size': config.chunk_size,
+        'chunk_overlap': config.chunk_overlap,
+        'k': config.k,
+        'rerank': config.rerank,
+        'prompt_budget': config.prompt_budget,
+        'chunks': len(chunks),
+        'hit_rate': hits / len(questions),
+        'prompt_hit_rate': prompt_hits / len(questions),
+        'prompt_tokens': float(np.mean(tokens)),
+        'latency_p50_ms': float(p50),
+        'latency_p95_ms': float(p95),
+        'latency_p99_ms': float(p99),
+    }
+
+
+def evaluate_grid(texts, questions, configs, llm, cache):
+    """Evaluira sve konfiguracije; segmentacija i embedding se rade jednom po chunker-u."""
+    question_vectors = _normalize_rows(cache.embed([q['question'] for q in questions]))
+    indexes = {}
+    results = []
+    for config in configs:
+        if config.chunker not in indexes:
+            chunks = [chunk for text in texts for chunk in split_chunks(text, *config.chunker)]
+            indexes[config.chunker] = (chunks, _normalize_rows(cache.embed(chunks)) if chunks else None)
+        chunks, matrix = indexes[config.chunker]
+        if not chunks:
+            raise ValueError(f"Korpus nema segmenata za {config.label}")
+        results.append(evaluate_config(config, chunks, matrix, questions, question_vectors, llm))
+    return results
+
+
+def choose_config(results, min_hit_rate):
+    """Najbrža konfiguracija (p95, pa broj tokena) čiji prompt sadrži očekivani član u bar min_hit_rate pitanja."""
+    passing = [r for r in results if r['prompt_hit_rate'] >= min_hit_rate]
+    if not passing:
+        return None
+    return min(passing, key=lambda r: (r['latency_p95_ms'], r['prompt_tokens']))
@@ -0,0 +1,63 @@
+import hashlib
+import io
+import os
+import zipfile
+
+from .rag_service import extract_text, split_chunks
+from .vector_store import embed_texts
+
+# Hash-evi već indeksiranih PDF-ova i podešavanja segmentacije, postavljaju se jednom po worker procesu
+_known_hashes = frozenset()
+_chunk_size, _chunk_overlap = 800, 0
+
+
+def hash_file(file):
+    """SHA-256 Django File/UploadedFile objekta, čitano u delovima."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_sources(source):
+    """Vraća (izvor, član_arhive) za svaki PDF u direktorijumu ili zip arhivi."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = archive.namelist()
+        return [(source, name) for name in sorted(names) if name.lower().endswith('.pdf')]
+
+    items = []
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        items.extend((os.path.join(root, name), None) for name in sorted(files) if name.lower().endswith('.pdf'))
+    return items
+
+
+def read_source(item):
+    path, member = item
+    if member is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(member)
+
+
+def init_worker(known_hashes, chunk_size=800, chunk_overlap=0):
+    global _known_hashes, _chunk_size, _chunk_overlap
+    _known_hashes = known_hashes
+    _chunk_size, _chunk_overlap = chunk_size, chunk_overlap
+
+
+def process_source(item):
+    """
+    Izvršava se u worker procesu: hash, ekstrakcija teksta i embedding jednog PDF-a.
+    Za već indeksirane fajlove vraća chunks=None bez parsiranja.
+    """
+    data = read_source(item)
+    content_hash = hashlib.sha256(data).hexdigest()
+    if content_hash in _known_hashes:
+        return item, content_hash, None, None
+
+    chunks = split_chunks(extract_text(io.BytesIO(data)), _chunk_size, _chunk_overlap)
+    embeddings = embed_texts(chunks) if chunks else []
+    return item, content_hash, chunks, embeddings
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.quantized_store import QuantizedVectorStore
+from api.vector_store import ChromaVectorStore
+
+
+def _memory_kb():
+    """VmRSS, RssAnon (privatna memorija) i RssFile (deljivi mmap/page cache) iz /proc."""
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Poredi Chroma i kvantizovani (int8 + IVF, mmap) backend: memorija po workeru, "
+        "cold-start i recall@k u odnosu na tačnu float32 pretragu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index-path', help="Direktorijum kvantizovanog indeksa (podrazumevano privremeni)")
+        parser.add_argument('--queries', type=int, default=200, help="Broj upita za recall@k")
+        parser.add_argument('--questions', help="Tekstualni fajl sa pitanjima (jedno po liniji) umesto sintetičkih upita")
+        parser.add_argument('-k', type=int, default=3)
+        parser.add_argument('--nlist', type=int, default=256)
+        parser.add_argument('--nprobe', type=int, default=16)
+        parser.add_argument('--rescore-factor', type=int, default=4)
+        # Interni režim: meri jedan backend u zasebnom procesu (kao novi worker)
+        parser.add_argument('--worker', choices=['chroma', 'quantized'], help=argparse.SUPPRESS)
+        parser.add_argument('--query-file', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.run_worker(options)
+
+        baseline = ChromaVectorStore()
+        data = baseline.collection.get(include=['embeddings', 'documents'])
+        if not data['ids']:
+            raise CommandError("Chroma kolekcija je prazna; prvo indeksirajte zakone.")
+        ids = data['ids']
+        embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+        self.stdout.write(f"Chroma kolekcija: {len(ids)} segmenata, dim={embeddings.shape[1]}")
+
+        # Privremeni direktorijum drži samo queries.npy i podrazumevani indeks; indeks zadat
+        # sa --index-path je van njega i ostaje na disku
+        with tempfile.TemporaryDirectory(prefix='bench_vs_') as workdir:
+            index_path = options['index_path'] or os.path.join(workdir, 'index')
+            store = QuantizedVectorStore(index_path, nlist=options['nlist'], nprobe=options['nprobe'],
+                                         rescore_factor=options['rescore_factor'])
+            if len(store) == 0:
+                started = time.perf_counter()
+                store.add(data['documents'], ids, embeddings=embeddings)
+                self.stdout.write(f"Kvantizovani indeks izgrađen za {time.perf_counter() - started:.2f}s")
+
+            queries = self.build_queries(options, embeddings, store)
+            query_file = os.path.join(workdir, 'queries.npy')
+            np.save(query_file, queries)
+
+            # Tačna float32 pretraga kao referenca za recall@k
+            k = options['k']
+            normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            truth = np.argsort(-(queries @ normalized.T), axis=1)[:, :k]
+            truth_ids = [{ids[i] for i in row} for row in truth]
+
+            rows = []
+            for backend in ('chroma', 'quantized'):
+                cmd = [sys.executable, sys.argv[0], 'bench_vector_store', '--worker', backend,
+                       '--query-file', query_file, '-k', str(k), '--index-path', index_path,
+                       '--nprobe', str(options['nprobe']), '--rescore-factor', str(options['rescore_factor'])]
+                started = time.perf_counter()
+                output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result['process_start'] = time.perf_counter() - started - result['query_time']
+                hits = sum(len(set(found) & expected) for found, expected in zip(result['ids'], truth_ids))
+                result['recall'] = hits / (k * len(truth_ids))
+                rows.append((backend, result))
+
+            self.stdout.write("")
+            self.stdout.write(f"{'backend':<10} {'recall@' + str(k):>9} {'cold start':>11} {'do upita':>10} "
+                              f"{'ms/upit':>8} {'RSS MB':>7} {'anon MB':>8} {'file MB':>8}")
+            for backend, r in rows:
+                self.stdout.write(
+                    f"{backend:<10} {r['recall']:>9.3f} {r['cold_start']:>10.2f}s {r['process_start']:>9.2f}s "
+                    f"{1000 * r['query_time'] / len(queries):>8.2f} {r['memory']['VmRSS'] / 1024:>7.1f} "
+                    f"{r['memory']['RssAnon'] / 1024:>8.1f} {r['memory']['RssFile'] / 1024:>8.1f}"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                "anon MB je privatna memorija workera; file MB su mmap stranice koje workeri dele kroz page cache."
+            ))
+
+    def build_queries(self, options, embeddings, store):
+        if options['questions']:
+            with open(options['questions'], encoding='utf-8') as f:
+                questions = [line.strip() for line in f if line.strip()]
+            queries = np.asarray(store.embed(questions), dtype=np.float32)
+        else:
+            # Sintetički upiti: prosek dva nasumična segmenta, da upit ne bi bio identičan nekom segmentu
+            rng = np.random.default_rng(0)
+            pairs = rng.integers(0, len(embeddings), size=(options['queries'], 2))
+            queries = embeddings[pairs[:, 0]] + embeddings[pairs[:, 1]]
+        return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def run_worker(self, options):
+        queries = np.load(options['query_file'])
+        k = options['k']
+
+        started = time.perf_counter()
+        if options['worker'] == 'chroma':
+            store = ChromaVectorStore()
+        else:
+            store = QuantizedVectorStore(options['index_path'], nprobe=options['nprobe'],
+                                         rescore_factor=options['rescore_factor'])
+        store.search(queries[0], k)
+        cold_start = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found = [store.search(q, k)['ids'] for q in queries]
+        query_time = time.perf_counter() - started
+
+        self.stdout.write(json.dumps({
+            'cold_start': cold_start,
+            'query_time': query_time,
+            'memory': _memory_kb(),
+            'ids': found,
+        }))
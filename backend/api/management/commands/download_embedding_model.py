@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.vector_store import EMBEDDING_MODEL_FILES, load_embedding_function
+
+
+class Command(BaseCommand):
+    help = (
+        "Preuzima lokalni embedding model (all-MiniLM-L6-v2, ONNX) u RAG_EMBEDDING_MODEL_PATH. "
+        "Jedini korak koji zahteva mrežu; posle njega ingest_laws, evaluate_rag i pretraga rade offline. "
+        "Za mašine bez mreže direktorijum se kopira sa mašine na kojoj je komanda pokrenuta."
+    )
+
+    def handle(self, *args, **options):
+        path = settings.RAG_EMBEDDING_MODEL_PATH
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        function = ONNXMiniLM_L6_V2()
+        function.DOWNLOAD_PATH = path
+        try:
+            # Poziv modela preuzima i raspakuje arhivu; zatim proveravamo da je offline učitavanje moguće
+            function(["provera"])
+            load_embedding_function()
+        except Exception as e:
+            raise CommandError(f"Preuzimanje modela u {path} nije uspelo: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Model je spreman u {path}/onnx ({len(EMBEDDING_MODEL_FILES)} fajlova)."))
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import itertools
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from api.evaluation import EmbeddingCache, EvalConfig, FakeLLM, RecordedLLM, choose_config, evaluate_grid, load_questions
+from api.ingestion import list_sources, read_source
+from api.models import DocumentMeta
+from api.rag_service import create_model, extract_text
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def _switches(value):
+    return [v.strip() == 'on' for v in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = (
+        "Evaluira kvalitet i latenciju RAG-a za mrežu konfiguracija (chunker, k, reranking, "
+        "budžet prompta) nad JSONL skupom pitanja sa očekivanim članovima zakona."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('questions', help='JSONL: {"question": ..., "expected_articles": [...]} po liniji')
+        parser.add_argument('--source', help="Direktorijum ili zip sa PDF-ovima (podrazumevano fajlovi iz DocumentMeta)")
+        parser.add_argument('--chunk-sizes', type=_ints, default=[400, 800, 1200])
+        parser.add_argument('--chunk-overlaps', type=_ints, default=[0])
+        parser.add_argument('--k', type=_ints, default=[1, 3, 5])
+        parser.add_argument('--rerank', type=_switches, default=[False, True], help="npr. off,on")
+        parser.add_argument('--budgets', type=_ints, default=[0], help="Budžet prompta u tokenima, 0 = bez ograničenja")
+        parser.add_argument('--llm', choices=['fake', 'recorded'], default='fake')
+        parser.add_argument('--recordings', default='eval_cache/recordings.jsonl',
+                            help="Snimljeni odgovori za --llm recorded")
+        parser.add_argument('--record', action='store_true',
+                            help="Promptove bez snimka pošalji Gemini-ju i snimi (zahteva mrežu)")
+        parser.add_argument('--fake-ms-per-token', type=float, default=0.1,
+                            help="Simulirana latencija lažnog LLM-a po tokenu prompta")
+        parser.add_argument('--cache-dir', default='eval_cache')
+        parser.add_argument('--min-hit-rate', type=float, default=0.8)
+        parser.add_argument('--output', help="JSON fajl sa svim rezultatima")
+
+    def handle(self, *args, **options):
+        questions = load_questions(options['questions'])
+        if not questions:
+            raise CommandError("Skup pitanja je prazan.")
+        texts = self.load_corpus(options['source'], os.path.join(options['cache_dir'], 'texts'))
+        if not texts:
+            raise CommandError("Korpus je prazan; navedite --source ili indeksirajte zakone.")
+
+        if options['llm'] == 'recorded':
+            llm = RecordedLLM(options['recordings'], model=create_model() if options['record'] else None)
+        else:
+            llm = FakeLLM(ms_per_token=options['fake_ms_per_token'])
+
+        configs = [
+            EvalConfig(size, overlap, k, rerank, budget)
+            for size, overlap, k, rerank, budget in itertools.product(
+                options['chunk_sizes'], options['chunk_overlaps'], options['k'], options['rerank'], options['budgets'])
+            if overlap < size
+        ]
+        self.stdout.write(f"{len(questions)} pitanja, {len(texts)} dokumenata, {len(configs)} konfiguracija")
+
+        try:
+            cache = EmbeddingCache(os.path.join(options['cache_dir'], 'embeddings'))
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        try:
+            results = evaluate_grid(texts, questions, configs, llm, cache)
+        except (KeyError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write("")
+        self.stdout.write(f"{'konfiguracija':<44} {'hit':>6} {'u promptu':>10} {'tokeni':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for r in results:
+            self.stdout.write(
+                f"{r['config']:<44} {r['hit_rate']:>6.2f} {r['prompt_hit_rate']:>10.2f} {r['prompt_tokens']:>8.0f} "
+                f"{r['latency_p50_ms']:>8.1f} {r['latency_p95_ms']:>8.1f} {r['latency_p99_ms']:>8.1f}"
+            )
+
+        current = EvalConfig(settings.RAG_CHUNK_SIZE, settings.RAG_CHUNK_OVERLAP, settings.RAG_N_RESULTS,
+                             settings.RAG_RERANK, settings.RAG_PROMPT_BUDGET)
+        self.stdout.write("")
+        self.stdout.write(f"Trenutna konfiguracija: {current.label}")
+        best = choose_config(results, options['min_hit_rate'])
+        if best:
+            self.stdout.write(self.style.SUCCESS(
+                f"Najbrža konfiguracija sa hit rate >= {options['min_hit_rate']:.2f}: {best['config']}"
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(f"Nijedna konfiguracija ne dostiže hit rate {options['min_hit_rate']:.2f}"))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'results': results, 'best': best}, f, ensure_ascii=False, indent=2)
+
+    def load_corpus(self, source, text_cache):
+        """Tekst svih PDF-ova; izvučeni tekst se kešira po SHA-256 sadržaja."""
+        if source:
+            blobs = (read_source(item) for item in list_sources(source))
+        else:
+            blobs = (self.read_document(doc) for doc in DocumentMeta.objects.all())
+
+        os.makedirs(text_cache, exist_ok=True)
+        texts = []
+        for data in blobs:
+            if data is None:
+                continue
+            cached = os.path.join(text_cache, hashlib.sha256(data).hexdigest() + '.txt')
+            if not os.path.exists(cached):
+                try:
+                    text = extract_text(io.BytesIO(data))
+                except Exception as e:
+                    self.stderr.write(f"PDF se ne može pročitati, preskačem: {e}")
+                    continue
+                with open(cached, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            with open(cached, encoding='utf-8') as f:
+                texts.append(f.read())
+        return texts
+
+    def read_document(self, doc):
+        try:
+            with doc.file_path.open('rb') as f:
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            self.stderr.write(f"Fajl za dokument {doc.id} nije pronađen: {doc.file_path}")
+            return None
@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.ingestion import init_worker, list_sources, process_source, read_source
+from api.models import DocumentMeta, User
+from api.vector_store import embed_texts, get_vector_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Indeksira sve PDF zakone iz direktorijuma ili zip arhive. Fajlovi koji su već "
+        "indeksirani (po SHA-256 sadržaja) se preskaču, pa prekinuto pokretanje nastavlja "
+        "tamo gde je stalo. Embedding radi lokalni ONNX model iz RAG_EMBEDDING_MODEL_PATH, bez "
+        "mrežnih poziva (model se priprema jednom sa manage.py download_embedding_model)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Direktorijum ili .zip arhiva sa PDF fajlovima")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Broj procesa za ekstrakciju i embedding (1 = u ovom procesu)")
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help="Broj dokumenata po upisu (checkpoint) u bazu i vektorski indeks")
+        parser.add_argument('--user', help="Korisničko ime za uploaded_by (podrazumevano prvi superuser)")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.exists(source):
+            raise CommandError(f"Izvor ne postoji: {source}")
+
+        self.user = self.get_user(options['user'])
+        self.store = get_vector_store()
+        items = list_sources(source)
+        if not items:
+            raise CommandError(f"Nema PDF fajlova u {source}")
+
+        known = set(DocumentMeta.objects.exclude(content_hash='').values_list('content_hash', flat=True))
+        self.total = len(items)
+        self.done = self.skipped = self.failed = self.indexed = self.segments = 0
+        self.started = time.perf_counter()
+        self.stdout.write(f"Pronađeno {self.total} PDF fajlova, već indeksirano u bazi: {len(known)}")
+
+        batch = []
+        initargs = (frozenset(known), settings.RAG_CHUNK_SIZE, settings.RAG_CHUNK_OVERLAP)
+        if options['workers'] > 1:
+            # spawn umesto fork: worker ne sme da nasledi otvorenu konekciju ka bazi
+            pool = ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker, initargs=initargs)
+        else:
+            # Jedan worker ne opravdava pokretanje novog interpretera; obrada ide u niti ovog procesa
+            pool = ThreadPoolExecutor(max_workers=1, initializer=init_worker, initargs=initargs)
+        try:
+            # Provera da je embedding model dostupan lokalno, pre slanja hiljada fajlova workerima
+            try:
+                pool.submit(embed_texts, ["provera"]).result()
+            except Exception as e:
+                raise CommandError(f"Lokalni embedding model nije dostupan: {e}")
+
+            # Najviše workers * 2 zadataka u letu, da roditelj ne drži Future za ceo korpus
+            pending = {}
+            remaining = iter(items)
+            while True:
+                for item in islice(remaining, options['workers'] * 2 - len(pending)):
+                    pending[pool.submit(process_source, item)] = item
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    self.done += 1
+                    try:
+                        item, content_hash, chunks, embeddings = future.result()
+                    except Exception as e:
+                        self.failed += 1
+                        self.stderr.write(f"Greška pri obradi {self.describe(item)}: {e}")
+                        continue
+
+                    if chunks is None or content_hash in known:
+                        self.skipped += 1
+                        continue
+                    if not chunks:
+                        # Kao i kod uploada: bez segmenata dokument nije indeksiran i ne dobija DocumentMeta
+                        self.failed += 1
+                        self.stderr.write(f"PDF ne sadrži tekst za indeksiranje: {self.describe(item)}")
+                        continue
+                    known.add(content_hash)
+                    batch.append((item, content_hash, chunks, embeddings))
+
+                    if len(batch) >= options['batch_size']:
+                        self.flush(batch)
+                        batch = []
+            self.flush(batch)
+        except KeyboardInterrupt:
+            raise CommandError("Prekinuto. Ponovnim pokretanjem nastavlja se od poslednjeg upisanog paketa.")
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Gotovo: indeksirano {self.indexed} dokumenata ({self.segments} segmenata), "
+            f"preskočeno {self.skipped}, grešaka {self.failed}, za {time.perf_counter() - self.started:.1f}s"
+        ))
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError("Korisnik za uploaded_by nije pronađen; navedite --user.")
+        return user
+
+    @staticmethod
+    def describe(item):
+        path, member = item
+        return f"{path}:{member}" if member else path
+
+    def flush(self, batch):
+        """Upisuje paket; ako ne uspe, ponavlja ga dokument po dokument, pa loš fajl samo ulazi u greške."""
+        if batch:
+            try:
+                self.write(batch)
+            except Exception:
+                for entry in batch:
+                    try:
+                        self.write([entry])
+                    except Exception as e:
+                        self.failed += 1
+                        self.stderr.write(f"Greška pri upisu {self.describe(entry[0])}: {e}")
+
+        self.report()
+
+    def write(self, batch):
+        """
+        Upisuje paket (checkpoint). Segmenti idu prvi, pod id-jevima izvedenim iz hash-a sadržaja,
+        pa ponovni upis paketa koji nije stigao do baze ne pravi duplikate. Fajlovi i DocumentMeta
+        redovi se potvrđuju zajedno: ako transakcija ne prođe, sačuvani fajlovi se brišu.
+        """
+        documents, ids, embeddings = [], [], []
+        for _, content_hash, chunks, chunk_embeddings in batch:
+            documents.extend(chunks)
+            ids.extend(f"{content_hash}_{i}" for i in range(len(chunks)))
+            embeddings.extend(chunk_embeddings)
+        if documents:
+            self.store.add(documents, ids, embeddings=embeddings)
+
+        # bulk_create ne prolazi kroz validaciju polja, pa dužine ograničavamo ovde
+        # (Django skraćuje ime fajla do max_length, a naslov sečemo na dužinu kolone)
+        path_length = DocumentMeta._meta.get_field('file_path').max_length
+        title_length = DocumentMeta._meta.get_field('title').max_length
+        stored = []
+        try:
+            with transaction.atomic():
+                docs = []
+                for item, content_hash, _, _ in batch:
+                    name = os.path.basename(item[1] or item[0])
+                    stored.append(default_storage.save(
+                        f'laws/{name}', ContentFile(read_source(item)), max_length=path_length,
+                    ))
+                    docs.append(DocumentMeta(
+                        uploaded_by=self.user,
+                        title=os.path.splitext(name)[0][:title_length],
+                        file_path=stored[-1],
+                        content_hash=content_hash,
+                    ))
+                DocumentMeta.objects.bulk_create(docs)
+        except BaseException:
+            for name in stored:
+                default_storage.delete(name)
+            raise
+
+        self.indexed += len(batch)
+        self.segments += len(documents)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        eta = (self.total - self.done) / rate if rate else 0
+        self.stdout.write(
+            f"[{self.done}/{self.total}] {rate:.1f} PDF/s, {self.segments / elapsed if elapsed else 0:.0f} seg/s, "
+            f"ETA {int(eta // 60)}m{int(eta % 60):02d}s (preskočeno {self.skipped}, grešaka {self.failed})"
+        )
@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from api.profiling import baseline_ms, cumulative_ms, measure_imports
+
+
+class Command(BaseCommand):
+    help = "Prikazuje koliko vremena odlazi na uvoz modula pri startu (python -X importtime)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('module', nargs='?', default='api.urls', help="Modul koji se meri (podrazumevano api.urls)")
+        parser.add_argument('--limit', type=int, default=20, help="Broj paketa/modula u izveštaju")
+
+    def handle(self, *args, **options):
+        module = options['module']
+        rows, heavy = measure_imports(module)
+
+        # Zbir "self" vremena po paketu najvišeg nivoa
+        packages = defaultdict(int)
+        for name, self_us, _ in rows:
+            packages[name.split('.')[0]] += self_us
+        total_ms = sum(packages.values()) / 1000
+
+        self.stdout.write(f"Ukupno uvoz (django.setup() + {module}): {total_ms:.1f} ms")
+        self.stdout.write(f"Od toga {module}: {cumulative_ms(rows, module):.1f} ms "
+                          f"({cumulative_ms(rows, module) / baseline_ms(rows, module):.2f}x ostatka starta)")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'paket':<40} {'ms':>9} {'%':>6}")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:options['limit']]:
+            self.stdout.write(f"{name:<40} {us / 1000:>9.1f} {100 * us / 1000 / total_ms:>5.1f}%")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'modul (cumulative)':<40} {'ms':>9}")
+        for name, _, cumulative_us in sorted(rows, key=lambda row: -row[2])[:options['limit']]:
+            self.stdout.write(f"{name:<40} {cumulative_us / 1000:>9.1f}")
+
+        self.stdout.write("")
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Teški RAG paketi učitani pri startu: {', '.join(heavy)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Teški RAG paketi se ne učitavaju pri startu."))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_chat_chatmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentmeta',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
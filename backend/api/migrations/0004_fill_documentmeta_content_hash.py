@@ -0,0 +1,32 @@
+import hashlib
+
+from django.db import migrations
+
+
+def fill_content_hash(apps, schema_editor):
+    """
+    Računa SHA-256 za dokumente upload-ovane pre polja content_hash, da ih ingest_laws
+    ne bi indeksirao ponovo. Redovi čiji fajl više ne postoji ostaju bez hash-a.
+    """
+    DocumentMeta = apps.get_model('api', 'DocumentMeta')
+    for doc in DocumentMeta.objects.filter(content_hash='').iterator():
+        digest = hashlib.sha256()
+        try:
+            with doc.file_path.open('rb') as f:
+                for chunk in f.chunks():
+                    digest.update(chunk)
+        except (FileNotFoundError, ValueError):
+            continue
+        doc.content_hash = digest.hexdigest()
+        doc.save(update_fields=['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_documentmeta_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
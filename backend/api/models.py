@@ -45,6 +45,8 @@ class DocumentMeta(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     file_path = models.FileField(upload_to='laws/')
+    # SHA-256 sadržaja PDF-a; služi da se isti fajl ne indeksira dva puta
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
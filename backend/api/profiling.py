@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+# Paketi koji ne smeju da se učitaju pri običnom startu (dolaze tek sa prvim RAG pozivom)
+HEAVY_MODULES = ('chromadb', 'onnxruntime', 'google.generativeai', 'grpc', 'PyPDF2', 'numpy')
+
+
+def measure_imports(module):
+    """
+    Uvozi modul u novom procesu sa `python -X importtime` (posle django.setup())
+    i vraća (redovi, učitani_teški_paketi). Svaki red je (ime, self_us, cumulative_us).
+    """
+    script = (
+        "import sys, django; django.setup(); "
+        f"import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        capture_output=True, text=True, env=env, check=True,
+    )
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    heavy = [m for m in proc.stdout.strip().splitlines()[-1].split(',') if m] if proc.stdout.strip() else []
+    return rows, heavy
+
+
+def cumulative_ms(rows, module):
+    """Ukupno vreme uvoza modula (sa svim podmodulima koje je on prvi povukao)."""
+    for name, _, cumulative_us in rows:
+        if name == module:
+            return cumulative_us / 1000
+    return 0.0
+
+
+def baseline_ms(rows, module):
+    """Vreme svih ostalih uvoza u istom procesu (start interpretera i django.setup())."""
+    return sum(self_us for _, self_us, _ in rows) / 1000 - cumulative_ms(rows, module)
@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from filelock import FileLock
+
+from .vector_store import VectorStore
+
+# Najmanje vektora po IVF listi pre treniranja centroida; ispod toga je
+# linearni prolaz kroz int8 kodove brži i tačniji od IVF-a.
+MIN_POINTS_PER_LIST = 39
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 256
+# Kada neraspoređeni "rep" naraste preko ovog udela, liste se ponovo slažu
+REGROUP_FRACTION = 0.1
+BLOCK_SIZE = 65536
+
+IVF_FILES = ('centroids.{}.npy', 'ivf_codes.{}.i8', 'ivf_scales.{}.f32', 'ivf_rows.{}.i64', 'ivf_offsets.{}.npy')
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _id_hashes(ids):
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(doc_id.encode('utf-8'), digest_size=8).digest(), 'little') for doc_id in ids],
+        dtype=np.uint64,
+    )
+
+
+def _quantize(x):
+    """Simetrična int8 kvantizacija sa posebnom skalom za svaki vektor."""
+    scales = np.abs(x).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(x / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedVectorStore(VectorStore):
+    """
+    Vektorska baza sa int8 embedding-ima u memory-mapped fajlovima.
+
+    Fajlovi se mapiraju samo za čitanje, pa ih svi worker procesi dele
+    kroz page cache umesto da svaki drži svoju kopiju indeksa. Pretraga
+    ide kroz IVF: int8 kodovi su na disku poređani po listama, pa upit
+    čita samo nprobe uzastopnih opsega plus mali neraspoređeni rep
+    (vektori dodati posle poslednjeg slaganja). Najboljih
+    n_results * rescore_factor kandidata se ponovo boduje tačnim
+    float32 vektorima.
+
+    Struktura direktorijuma:
+        meta.json             dim, count, generacija IVF-a, grouped_count
+        vectors.f32           originalni (normalizovani) vektori, redom upisa
+        codes.i8, scales.f32  int8 kodovi i skale, redom upisa (za rep)
+        records.bin, ends.i64 "id\\0tekst" zapisi i njihovi krajnji offseti
+        assign.i32            lista svakog vektora (koristi samo upis)
+        ids.u64               64-bitni heš svakog id-ja (provera duplikata pri upisu)
+        centroids.<gen>.npy   IVF centroidi
+        ivf_codes.<gen>.i8, ivf_scales.<gen>.f32, ivf_rows.<gen>.i64
+                              kodovi, skale i redni brojevi poređani po listama
+        ivf_offsets.<gen>.npy početak svake liste (nlist + 1)
+    """
+
+    def __init__(self, path, nlist=256, nprobe=16, rescore_factor=4):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        os.makedirs(path, exist_ok=True)
+        self._lock = FileLock(self._file('.lock'))
+        self._meta_stamp = None
+        self._refresh()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def __len__(self):
+        self._refresh()
+        return self.meta['count']
+
+    # --- Čitanje ---
+
+    def _read_meta(self):
+        try:
+            with open(self._file('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'dim': None, 'count': 0, 'generation': 0, 'trained_count': 0, 'grouped_count': 0}
+
+    def _refresh(self):
+        """Ponovo mapira fajlove ako je drugi proces u međuvremenu dodao vektore."""
+        try:
+            st = os.stat(self._file('meta.json'))
+            stamp = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        if stamp is not None and stamp == self._meta_stamp:
+            return
+
+        self.meta = self._read_meta()
+        self._meta_stamp = stamp
+        n, dim, gen = self.meta['count'], self.meta['dim'], self.meta['generation']
+        self.centroids = self.ivf_codes = self.ivf_scales = self.ivf_rows = self.ivf_offsets = None
+        if n == 0:
+            self.vectors = self.codes = self.scales = self.ends = self.records = None
+            return
+
+        self.vectors = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(n, dim))
+        self.codes = np.memmap(self._file('codes.i8'), dtype=np.int8, mode='r', shape=(n, dim))
+        self.scales = np.memmap(self._file('scales.f32'), dtype=np.float32, mode='r', shape=(n,))
+        self.ends = np.memmap(self._file('ends.i64'), dtype=np.int64, mode='r', shape=(n,))
+        self.records = np.memmap(self._file('records.bin'), dtype=np.uint8, mode='r', shape=(int(self.ends[-1]),))
+        if gen:
+            grouped = self.meta['grouped_count']
+            self.centroids = np.load(self._file(f'centroids.{gen}.npy'))
+            self.ivf_codes = np.memmap(self._file(f'ivf_codes.{gen}.i8'), dtype=np.int8, mode='r', shape=(grouped, dim))
+            self.ivf_scales = np.memmap(self._file(f'ivf_scales.{gen}.f32'), dtype=np.float32, mode='r', shape=(grouped,))
+            self.ivf_rows = np.memmap(self._file(f'ivf_rows.{gen}.i64'), dtype=np.int64, mode='r', shape=(grouped,))
+            self.ivf_offsets = np.load(self._file(f'ivf_offsets.{gen}.npy'))
+
+    def _record(self, i):
+        start = int(self.ends[i - 1]) if i else 0
+        doc_id, _, text = bytes(self.records[start:int(self.ends[i])]).decode('utf-8').partition('\0')
+        return doc_id, text
+
+    def _existing_ids(self, ids, n):
+        """
+        Koji od zadatih id-jeva već postoje među prvih n zapisa. Heševi se čitaju sa diska
+        u blokovima, pa upis ne drži skup svih id-jeva u memoriji procesa.
+        """
+        if n == 0:
+            return set()
+        self._backfill_id_hashes(n)
+        hashes = _id_hashes(ids)
+        stored = np.memmap(self._file('ids.u64'), dtype=np.uint64, mode='r', shape=(n,))
+        found = set()
+        for start in range(0, n, BLOCK_SIZE):
+            for row in np.flatnonzero(np.isin(stored[start:start + BLOCK_SIZE], hashes)):
+                # Poklapanje heša proveravamo pravim id-jem, zbog mogućih kolizija
+                found.add(self._record(start + int(row))[0])
+        return found
+
+    def _backfill_id_hashes(self, n):
+        # Indeks napravljen pre ids.u64 (ili prekinut upis) ima kraći fajl; dopunjava se iz records.bin
+        path = self._file('ids.u64')
+        have = os.path.getsize(path) // 8 if os.path.exists(path) else 0
+        with open(path, 'ab') as f:
+            for start in range(have, n, BLOCK_SIZE):
+                stop = min(start + BLOCK_SIZE, n)
+                f.write(_id_hashes([self._record(i)[0] for i in range(start, stop)]).tobytes())
+
+    def _scan(self, q, start, stop):
+        """Približni skorovi za uzastopne redove start:stop u redosledu upisa."""
+        rows = np.arange(start, stop)
+        scores = np.empty(len(rows), dtype=np.float32)
+        for block in range(start, stop, BLOCK_SIZE):
+            end = min(block + BLOCK_SIZE, stop)
+            scores[block - start:end - start] = (self.codes[block:end].astype(np.float32) @ q) * self.scales[block:end]
+        return rows, scores
+
+    def _approximate(self, q, n_results):
+        """Redni brojevi kandidata i njihovi int8 skorovi."""
+        n = self.meta['count']
+        if self.centroids is None:
+            return self._scan(q, 0, n)
+
+        # Samo nprobe uzastopnih opsega iz lista poređanih po centroidima
+        rows, scores = [], []
+        for probe in np.argsort(-(self.centroids @ q))[:self.nprobe]:
+            start, stop = int(self.ivf_offsets[probe]), int(self.ivf_offsets[probe + 1])
+            if start == stop:
+                continue
+            rows.append(np.asarray(self.ivf_rows[start:stop]))
+            scores.append((self.ivf_codes[start:stop].astype(np.float32) @ q) * self.ivf_scales[start:stop])
+
+        # Rep (vektori dodati posle poslednjeg slaganja) je takođe uzastopan
+        tail_rows, tail_scores = self._scan(q, self.meta['grouped_count'], n)
+        rows.append(tail_rows)
+        scores.append(tail_scores)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        if len(rows) < n_results:
+            return self._scan(q, 0, n)
+        return rows, scores
+
+    def search(self, embedding, n_results):
+        self._refresh()
+        if self.meta['count'] == 0:
+            return {'ids': [], 'documents': []}
+
+        q = _normalize(np.asarray(embedding, dtype=np.float32))
+        # 1. Približni skorovi nad int8 kodovima
+        candidates, approx = self._approximate(q, n_results)
+
+        # 2. Tačno ponovno bodovanje najboljih kandidata float32 vektorima
+        m = min(len(candidates), n_results * self.rescore_factor)
+        top = np.sort(candidates[np.argpartition(-approx, m - 1)[:m]])
+        exact = self.vectors[top] @ q
+        best = top[np.argsort(-exact)[:n_results]]
+
+        ids, documents = [], []
+        for i in best:
+            doc_id, text = self._record(int(i))
+            ids.append(doc_id)
+            documents.append(text)
+        return {'ids': ids, 'documents': documents}
+
+    # --- Upis ---
+
+    def add(self, documents, ids, embeddings=None):
+        if not documents:
+            return
+        if embeddings is None:
+            embeddings = self.embed(documents)
+        x = _normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            self._meta_stamp = None
+            self._refresh()
+            meta = dict(self.meta)
+            if meta['dim'] is None:
+                meta['dim'] = x.shape[1]
+            elif meta['dim'] != x.shape[1]:
+                raise ValueError(f"Dimenzija embedding-a {x.shape[1]} ne odgovara indeksu ({meta['dim']})")
+
+            self._truncate(meta)
+            # Id-jevi koji već postoje se preskaču, pa ponovljen upis istog paketa nema efekta
+            existing = self._existing_ids(ids, meta['count'])
+            keep, seen = [], set()
+            for row, doc_id in enumerate(ids):
+                if doc_id not in existing and doc_id not in seen:
+                    seen.add(doc_id)
+                    keep.append(row)
+            if not keep:
+                return
+            documents, ids, x = [documents[row] for row in keep], [ids[row] for row in keep], x[keep]
+
+            codes, scales = _quantize(x)
+            records = [f"{doc_id}\0{doc}".encode('utf-8') for doc_id, doc in zip(ids, documents)]
+            offset = int(self.ends[-1]) if meta['count'] else 0
+            ends = offset + np.cumsum([len(r) for r in records], dtype=np.int64)
+
+            with open(self._file('vectors.f32'), 'ab') as f:
+                f.write(x.tobytes())
+            with open(self._file('codes.i8'), 'ab') as f:
+                f.write(codes.tobytes())
+            with open(self._file('scales.f32'), 'ab') as f:
+                f.write(scales.tobytes())
+            with open(self._file('records.bin'), 'ab') as f:
+                f.write(b''.join(records))
+            with open(self._file('ends.i64'), 'ab') as f:
+                f.write(ends.tobytes())
+            with open(self._file('ids.u64'), 'ab') as f:
+                f.write(_id_hashes(ids).tobytes())
+            if meta['generation']:
+                with open(self._file('assign.i32'), 'ab') as f:
+                    f.write(np.argmax(x @ self.centroids.T, axis=1).astype(np.int32).tobytes())
+
+            meta['count'] += len(x)
+            # (Re)treniranje IVF-a kada indeks dovoljno naraste (duplo od poslednjeg treniranja),
+            # a između toga samo ponovno slaganje lista kada rep postane prevelik
+            if meta['count'] >= self.nlist * MIN_POINTS_PER_LIST and meta['count'] >= 2 * meta['trained_count']:
+                self._train(meta)
+                self._regroup(meta)
+            elif meta['generation'] and meta['count'] - meta['grouped_count'] > REGROUP_FRACTION * meta['grouped_count']:
+                self._regroup(meta)
+
+            self._write_meta(meta)
+            self._refresh()
+
+    def _truncate(self, meta):
+        # Odbacuje ostatke prekinutog upisa koji nikad nije stigao do meta.json
+        n, dim = meta['count'], meta['dim']
+        sizes = {
+            'vectors.f32': n * dim * 4,
+            'codes.i8': n * dim,
+            'scales.f32': n * 4,
+            'ends.i64': n * 8,
+            'records.bin': int(self.ends[-1]) if n else 0,
+        }
+        if meta['generation']:
+            sizes['assign.i32'] = n * 4
+        for name, size in sizes.items():
+            if os.path.exists(self._file(name)) and os.path.getsize(self._file(name)) != size:
+                os.truncate(self._file(name), size)
+        # ids.u64 sme da bude kraći (dopunjava ga _backfill_id_hashes), ali ne i duži
+        if os.path.exists(self._file('ids.u64')) and os.path.getsize(self._file('ids.u64')) > n * 8:
+            os.truncate(self._file('ids.u64'), n * 8)
+
+    def _write_meta(self, meta):
+        # Meta se upisuje poslednja i atomski, pa čitaoci uvek vide konzistentan prefiks
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file('meta.json'))
+
+    def _train(self, meta):
+        """Sferni k-means nad uzorkom vektora i nova lista za svaki vektor (assign.i32)."""
+        n, dim = meta['count'], meta['dim']
+        vectors = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(n, dim))
+        rng = np.random.default_rng(0)
+
+        sample_size = min(n, self.nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            filled = np.bincount(labels, minlength=self.nlist) > 0
+            centroids[filled] = _normalize(sums[filled])
+
+        # assign.i32 čita samo proces koji upisuje (pod lock-om), pa se menja na licu mesta
+        tmp = self._file('assign.i32.tmp')
+        with open(tmp, 'wb') as f:
+            for start in range(0, n, BLOCK_SIZE):
+                block = np.asarray(vectors[start:start + BLOCK_SIZE])
+                f.write(np.argmax(block @ centroids.T, axis=1).astype(np.int32).tobytes())
+        os.replace(tmp, self._file('assign.i32'))
+
+        self.centroids = centroids
+        meta['trained_count'] = n
+
+    def _regroup(self, meta):
+        """Piše novu generaciju IVF fajlova: kodovi, skale i redni brojevi poređani po listama."""
+        n, dim = meta['count'], meta['dim']
+        assign = np.fromfile(self._file('assign.i32'), dtype=np.int32, count=n)
+        codes = np.memmap(self._file('codes.i8'), dtype=np.int8, mode='r', shape=(n, dim))
+        scales = np.memmap(self._file('scales.f32'), dtype=np.float32, mode='r', shape=(n,))
+
+        order = np.argsort(assign, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self.centroids)))])
+
+        gen = meta['generation'] + 1
+        np.save(self._file(f'centroids.{gen}.npy'), self.centroids)
+        with open(self._file(f'ivf_codes.{gen}.i8'), 'wb') as f:
+            for start in range(0, n, BLOCK_SIZE):
+                f.write(np.asarray(codes[order[start:start + BLOCK_SIZE]]).tobytes())
+        np.asarray(scales[order]).tofile(self._file(f'ivf_scales.{gen}.f32'))
+        order.astype(np.int64).tofile(self._file(f'ivf_rows.{gen}.i64'))
+        np.save(self._file(f'ivf_offsets.{gen}.npy'), offsets.astype(np.int64))
+
+        # Prethodnu generaciju čuvamo jer je čitaoci možda upravo mapiraju
+        for pattern in IVF_FILES:
+            old = self._file(pattern.format(gen - 2))
+            if os.path.exists(old):
+                os.remove(old)
+
+        meta['generation'] = gen
+        meta['grouped_count'] = n
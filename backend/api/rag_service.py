@@ -1,82 +1,138 @@
 import os
-import chromadb
-import google.generativeai as genai
-from PyPDF2 import PdfReader
+import re
+import unicodedata
 from django.conf import settings
 
+from .vector_store import get_vector_store
+
+def extract_text(file):
+    """Vraća ceo tekst PDF-a (putanja ili file-like objekat)."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file)
+    text = ""
+    for page in reader.pages:
+        content = page.extract_text()
+        if content:
+            text += content
+    return text
+
+def split_chunks(text, size=800, overlap=0):
+    """Deli tekst na segmente (chunks) sa opcionim preklapanjem, preskačući prekratke ostatke."""
+    # Smanjili smo na 800 karaktera radi bolje preciznosti Gemini-ja
+    step = size - overlap
+    return [text[i:i+size] for i in range(0, len(text), step) if len(text[i:i+size]) > 50]
+
+# Koliko puta više kandidata se dohvata iz vektorske baze kada je reranking uključen
+RERANK_CANDIDATES = 4
+
+def normalize_text(text):
+    """Mala slova bez dijakritika (č -> c, đ -> d)."""
+    text = unicodedata.normalize('NFKD', text.casefold().replace('đ', 'd'))
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+def _terms(text):
+    # Brojevi (članovi, stavovi) su bitni bez obzira na dužinu, ostale reči od bar 3 slova
+    return {word for word in re.findall(r'\w+', normalize_text(text)) if len(word) >= 3 or word.isdigit()}
+
+def rerank(question, documents):
+    """Leksički reranking: segmenti sa više reči iz pitanja idu napred, redosled iz vektorske pretrage razbija nerešeno."""
+    terms = _terms(question)
+    if not terms:
+        return list(documents)
+    scored = [(len(terms & _terms(doc)) / len(terms), -rank, doc) for rank, doc in enumerate(documents)]
+    return [doc for _, _, doc in sorted(scored, reverse=True)]
+
+def estimate_tokens(text):
+    """Gruba procena broja tokena (~4 karaktera po tokenu)."""
+    return (len(text) + 3) // 4
+
+def build_context(documents, budget=0):
+    """Spaja segmente u kontekst; budget (u tokenima, 0 = bez ograničenja) seče višak."""
+    context = " ".join(documents)
+    if budget:
+        context = context[:budget * 4]
+    return context
+
+def build_prompt(question, context):
+    return f"""
+            Ti si stručni pravni asistent za građanska prava u Srbiji. 
+            Koristi isključivo sledeći kontekst da odgovoriš na pitanje. 
+            Odgovori moraju biti profesionalni, tačni i zasnovani samo na dostavljenom tekstu.
+            Ako u kontekstu nema odgovora, reci da na osnovu trenutne baze ne možeš dati precizan odgovor.
+            Svaki clan zakona mora biti referenciran, u skladu sa kontekstom, i potrebno je pruziti linkove ka svim zakonima koji se koriste iz konteksta.
+            
+            KONTEKST: {context}
+            PITANJE: {question}
+            """
+
+def create_model():
+    """Pravi Gemini model koji generiše odgovore."""
+    # Teške zavisnosti (grpc, protobuf) učitavamo tek pri prvoj upotrebi
+    import google.generativeai as genai
+
+    # Konfiguracija Gemini modela
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    
+    # PROMENA: Koristimo stabilniju oznaku modela
+    # Ako 'gemini-1.5-flash-latest' ne prođe, probaj 'gemini-pro'
+    try:
+        return genai.GenerativeModel('gemini-3-flash-preview')
+    except Exception as e:
+        print(f"Greška pri inicijalizaciji gemini-pro: {e}")
+        # Zadnja opcija ako gemini-pro ne prođe
+        return genai.GenerativeModel('gemini-1.5-flash')
+
 class RAGService:
     def __init__(self):
-        # Inicijalizacija klijenta za vektorsku bazu
-        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.chroma_client.get_or_create_collection(name="zakoni")
-        
-        # Konfiguracija Gemini modela
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        
-        # PROMENA: Koristimo stabilniju oznaku modela
-        # Ako 'gemini-1.5-flash-latest' ne prođe, probaj 'gemini-pro'
-        try:
-            self.model = genai.GenerativeModel('gemini-3-flash-preview')
-        except Exception as e:
-            print(f"Greška pri inicijalizaciji gemini-pro: {e}")
-            # Zadnja opcija ako gemini-pro ne prođe
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Vektorska baza (Chroma ili kvantizovani mmap indeks, vidi RAG_VECTOR_BACKEND)
+        self.store = get_vector_store()
+        self.model = create_model()
 
     def process_pdf(self, file_path, doc_id):
-        """Čita PDF, deli ga na delove i ubacuje u ChromaDB."""
+        """
+        Čita PDF, deli ga na delove i ubacuje u vektorsku bazu pod id-jevima "{doc_id}_{i}".
+        Vraća broj indeksiranih segmenata (0 ako fajl ne postoji ili nema teksta).
+        """
         if not os.path.exists(file_path):
             print(f"Fajl nije pronađen: {file_path}")
-            return
-
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text += content
-
-        # Deljenje teksta na segmente (chunks)
-        # Smanjili smo na 800 karaktera radi bolje preciznosti Gemini-ja
-        chunks = [text[i:i+800] for i in range(0, len(text), 800) if len(text[i:i+800]) > 50]
+            return 0
+
+        chunks = split_chunks(extract_text(file_path), settings.RAG_CHUNK_SIZE, settings.RAG_CHUNK_OVERLAP)
         
         if not chunks:
             print("Nema teksta za indeksiranje.")
-            return
+            return 0
 
         # Ubacivanje u vektorsku bazu
         ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
-        self.collection.add(
+        self.store.add(
             documents=chunks,
             ids=ids
         )
         print(f"Indeksirano {len(chunks)} segmenata za dokument {doc_id}")
+        return len(chunks)
 
     def get_answer(self, question):
         """Pronalazi kontekst i generiše odgovor putem Gemini API-ja."""
         try:
             # 1. Pretraga najsličnijih delova zakona
-            results = self.collection.query(
-                query_texts=[question],
-                n_results=3
-            )
+            n_results = settings.RAG_N_RESULTS
+            if settings.RAG_RERANK:
+                n_results *= RERANK_CANDIDATES
+            results = self.store.query(question, n_results=n_results)
             
             # Provera da li imamo rezultate pre spajanja
-            if not results['documents'] or not results['documents'][0]:
+            if not results['documents']:
                 return "Žao mi je, ne mogu da pronađem relevantne informacije u bazi zakona."
 
-            context = " ".join(results['documents'][0])
+            documents = results['documents']
+            if settings.RAG_RERANK:
+                documents = rerank(question, documents)[:settings.RAG_N_RESULTS]
+            context = build_context(documents, settings.RAG_PROMPT_BUDGET)
 
             # 2. Prompt inženjering
-            prompt = f"""
-            Ti si stručni pravni asistent za građanska prava u Srbiji. 
-            Koristi isključivo sledeći kontekst da odgovoriš na pitanje. 
-            Odgovori moraju biti profesionalni, tačni i zasnovani samo na dostavljenom tekstu.
-            Ako u kontekstu nema odgovora, reci da na osnovu trenutne baze ne možeš dati precizan odgovor.
-            Svaki clan zakona mora biti referenciran, u skladu sa kontekstom, i potrebno je pruziti linkove ka svim zakonima koji se koriste iz konteksta.
-            
-            KONTEKST: {context}
-            PITANJE: {question}
-            """
+            prompt = build_prompt(question, context)
             
             response = self.model.generate_content(prompt)
             return response.text
@@ -58,7 +58,7 @@ class DocumentMetaSerializer(serializers.ModelSerializer):
         model = DocumentMeta
         fields = '__all__'
         # Ako želiš da uploaded_by bude automatski dodat:
-        extra_kwargs = {'uploaded_by': {'read_only': True}}
+        extra_kwargs = {'uploaded_by': {'read_only': True}, 'content_hash': {'read_only': True}}
 
 # api/serializers.py
 
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import User, Folder, Chat
+from .cache import invalidate_user, invalidate_folder, invalidate_chat
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_user_cache(sender, instance, **kwargs):
+    invalidate_user(instance)
+
+
+@receiver([post_save, post_delete], sender=Folder)
+def clear_folder_cache(sender, instance, **kwargs):
+    invalidate_folder(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Chat)
+def clear_chat_cache(sender, instance, **kwargs):
+    invalidate_chat(instance.pk)
@@ -0,0 +1,125 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Fajlovi koje ONNX model mora da ima; ako neki nedostaje, chromadb bi model preuzeo sa mreže
+EMBEDDING_MODEL_FILES = (
+    'config.json', 'model.onnx', 'special_tokens_map.json', 'tokenizer_config.json', 'tokenizer.json', 'vocab.txt',
+)
+
+_embedding_function = None
+
+
+def _model_path():
+    path = settings.RAG_EMBEDDING_MODEL_PATH
+    missing = [name for name in EMBEDDING_MODEL_FILES if not os.path.exists(os.path.join(path, 'onnx', name))]
+    if missing:
+        raise ImproperlyConfigured(
+            f"Embedding model nije pronađen u {path} (nedostaje {', '.join(missing)}). Pripremite ga sa "
+            f"'python manage.py download_embedding_model' na mašini sa pristupom mreži ili podesite "
+            f"RAG_EMBEDDING_MODEL_PATH."
+        )
+    return path
+
+
+def embedding_model_id():
+    """SHA-256 fajla model.onnx: isti model daje isti id bez obzira na putanju, drugi model drugi id."""
+    digest = hashlib.sha256()
+    with open(os.path.join(_model_path(), 'onnx', 'model.onnx'), 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_embedding_function():
+    """
+    Lokalni ONNX model (all-MiniLM-L6-v2), isti koji Chroma koristi podrazumevano, ali
+    učitan iz RAG_EMBEDDING_MODEL_PATH. Model se nikad ne preuzima u toku rada; ako ga
+    nema, greška kaže kako da se pripremi (manage.py download_embedding_model).
+    """
+    path = _model_path()
+
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+    function = ONNXMiniLM_L6_V2()
+    function.DOWNLOAD_PATH = path
+    return function
+
+
+def embed_texts(texts):
+    """Embedding lokalnim ONNX modelom, bez mrežnih poziva (vidi load_embedding_function)."""
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = load_embedding_function()
+    return _embedding_function(texts)
+
+
+class VectorStore:
+    """Zajednički interfejs vektorskih baza koje koristi RAGService."""
+
+    def embed(self, texts):
+        return embed_texts(texts)
+
+    def add(self, documents, ids, embeddings=None):
+        """Dodaje segmente; id koji već postoji u bazi se ne duplira."""
+        raise NotImplementedError
+
+    def search(self, embedding, n_results):
+        """Vraća {'ids': [...], 'documents': [...]} za najbližih n_results segmenata."""
+        raise NotImplementedError
+
+    def query(self, text, n_results):
+        return self.search(self.embed([text])[0], n_results)
+
+
+class ChromaVectorStore(VectorStore):
+    """Originalni backend: ChromaDB kolekcija sa float embedding-ima."""
+
+    def __init__(self, path="./chroma_db", collection_name="zakoni"):
+        # chromadb povlači onnxruntime i opentelemetry, pa ga ne uvozimo na nivou modula
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    # Embedding-e uvek računamo sami (embed_texts), da Chroma ne bi preuzimala model sa mreže
+    def add(self, documents, ids, embeddings=None):
+        if embeddings is None:
+            embeddings = self.embed(documents)
+        self.collection.upsert(documents=documents, ids=ids, embeddings=embeddings)
+
+    def search(self, embedding, n_results):
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results)
+        return self._flatten(results)
+
+    @staticmethod
+    def _flatten(results):
+        return {
+            'ids': results['ids'][0] if results['ids'] else [],
+            'documents': results['documents'][0] if results['documents'] else [],
+        }
+
+
+_store = None
+
+
+def get_vector_store():
+    """Vraća vektorsku bazu za ovaj proces (jedna instanca po workeru)."""
+    global _store
+    if _store is None:
+        backend = settings.RAG_VECTOR_BACKEND
+        if backend == 'chroma':
+            _store = ChromaVectorStore()
+        elif backend == 'quantized':
+            from .quantized_store import QuantizedVectorStore
+            _store = QuantizedVectorStore(
+                settings.RAG_QUANTIZED_INDEX_PATH,
+                nlist=settings.RAG_IVF_NLIST,
+                nprobe=settings.RAG_IVF_NPROBE,
+                rescore_factor=settings.RAG_RESCORE_FACTOR,
+            )
+        else:
+            raise ImproperlyConfigured(f"Nepoznat RAG_VECTOR_BACKEND: {backend}")
+    return _store
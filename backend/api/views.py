@@ -5,10 +5,13 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.parsers import MultiPartParser, FormParser
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError
 
 from .models import Folder, Chat, ChatMessage
 from .serializers import *
 from .rag_service import RAGService
+from .cache import user_owns_chat, user_owns_folder
+from .ingestion import hash_file
 
 # --- AUTH & ADMIN ---
 
@@ -43,18 +46,34 @@ class AdminUploadView(APIView):
     def post(self, request):
         serializer = DocumentMetaSerializer(data=request.data)  
         if serializer.is_valid():
+            content_hash = hash_file(serializer.validated_data['file_path'])
             doc = serializer.save(uploaded_by=request.user)
             file_full_path = doc.file_path.path
             
             try:
                 rag = RAGService()
-                rag.process_pdf(file_full_path, str(doc.id))
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+                # Segmenti nose id-jeve po hash-u sadržaja, isto kao kod manage.py ingest_laws
+                indexed = rag.process_pdf(file_full_path, content_hash)
             except Exception as e:
+                self.discard(doc)
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            if not indexed:
+                self.discard(doc)
+                return Response({"error": "PDF ne sadrži tekst za indeksiranje."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Hash se upisuje tek kada je dokument zaista u vektorskoj bazi, jer ga ingest_laws po njemu preskače
+            doc.content_hash = content_hash
+            doc.save(update_fields=['content_hash'])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def discard(doc):
+        """Uklanja dokument koji nije indeksiran, da ne ostane u bazi kao da jeste."""
+        doc.file_path.delete(save=False)
+        doc.delete()
+
 # --- FOLDERI ---
 
 @extend_schema(tags=['Folders'])
@@ -77,7 +96,9 @@ class FolderChatListView(generics.ListAPIView):
 
     def get_queryset(self):
         folder_id = self.kwargs['folder_id']
-        return Chat.objects.filter(folder_id=folder_id, folder__user=self.request.user)
+        if not user_owns_folder(self.request.user, folder_id):
+            return Chat.objects.none()
+        return Chat.objects.filter(folder_id=folder_id)
 
 @extend_schema(tags=['Chats'])
 class ChatCreateView(generics.ListCreateAPIView):
@@ -89,11 +110,9 @@ class ChatCreateView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         folder_id = self.request.data.get('folder_id')
-        try:
-            folder = Folder.objects.get(id=folder_id, user=self.request.user)
-            serializer.save(folder=folder)
-        except Folder.DoesNotExist:
+        if not user_owns_folder(self.request.user, folder_id):
             raise PermissionDenied("Folder ne postoji ili nemate pristup.")
+        serializer.save(folder_id=int(folder_id))
 
 # --- PORUKE I AI LOGIKA ---
 
@@ -104,7 +123,9 @@ class ChatHistoryView(generics.ListAPIView):
 
     def get_queryset(self):
         chat_id = self.kwargs['chat_id']
-        return ChatMessage.objects.filter(chat_id=chat_id, chat__folder__user=self.request.user).order_by('timestamp')
+        if not user_owns_chat(self.request.user, chat_id):
+            return ChatMessage.objects.none()
+        return ChatMessage.objects.filter(chat_id=chat_id).order_by('timestamp')
 
 @extend_schema(
     tags=['AI Engine'],
@@ -130,8 +151,8 @@ class ChatView(APIView):
         if not chat_id or not question:
             return Response({"error": "Nedostaju chat_id ili question"}, status=status.HTTP_400_BAD_REQUEST)
 
-        chat_thread = Chat.objects.filter(id=chat_id, folder__user=request.user).first()
-        if not chat_thread:
+        # Provera vlasništva ide preko keša, bez JOIN-a na folder__user
+        if not user_owns_chat(request.user, chat_id):
             return Response({"error": "Razgovor nije pronađen"}, status=status.HTTP_404_NOT_FOUND)
 
         try:
@@ -140,10 +161,14 @@ class ChatView(APIView):
         except Exception as e:
             answer = "Žao mi je, trenutno ne mogu da pristupim bazi zakona."
 
-        ChatMessage.objects.create(
-            chat=chat_thread,
-            question=question,
-            answer=answer
-        )
+        try:
+            ChatMessage.objects.create(
+                chat_id=int(chat_id),
+                question=question,
+                answer=answer
+            )
+        except IntegrityError:
+            # Chat je obrisan u međuvremenu (keš vlasništva još nije istekao)
+            return Response({"error": "Razgovor nije pronađen"}, status=status.HTTP_404_NOT_FOUND)
 
         return Response({"answer": answer}, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -117,6 +117,21 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMemCache je po procesu; za više workera postaviti zajednički backend (Redis/Memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chatbot-cache',
+    }
+}
+
+# TTL (u sekundama) za keširanog korisnika iz JWT-a i za proveru vlasništva nad chat/folder ID-jevima
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+OWNERSHIP_CACHE_TTL = int(os.getenv('OWNERSHIP_CACHE_TTL', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -155,7 +170,7 @@ STATIC_URL = 'static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -168,3 +183,23 @@ SPECTACULAR_SETTINGS = {
 }
 
 AUTH_USER_MODEL = 'api.User'
+
+# RAG vektorska baza: 'chroma' (podrazumevano) ili 'quantized' (int8 + IVF, memory-mapped)
+RAG_VECTOR_BACKEND = os.getenv('RAG_VECTOR_BACKEND', 'chroma')
+RAG_QUANTIZED_INDEX_PATH = os.getenv('RAG_QUANTIZED_INDEX_PATH', './quantized_index')
+RAG_IVF_NLIST = int(os.getenv('RAG_IVF_NLIST', '256'))
+RAG_IVF_NPROBE = int(os.getenv('RAG_IVF_NPROBE', '16'))
+RAG_RESCORE_FACTOR = int(os.getenv('RAG_RESCORE_FACTOR', '4'))
+
+# Lokalni embedding model (all-MiniLM-L6-v2, ONNX); u toku rada se ne preuzima sa mreže.
+# Priprema: python manage.py download_embedding_model (ili raspakovati onnx.tar.gz u ovaj direktorijum)
+RAG_EMBEDDING_MODEL_PATH = os.getenv(
+    'RAG_EMBEDDING_MODEL_PATH', os.path.expanduser('~/.cache/chroma/onnx_models/all-MiniLM-L6-v2'),
+)
+
+# Podešavanja RAG odgovora (vidi manage.py evaluate_rag za poređenje konfiguracija)
+RAG_CHUNK_SIZE = int(os.getenv('RAG_CHUNK_SIZE', '800'))
+RAG_CHUNK_OVERLAP = int(os.getenv('RAG_CHUNK_OVERLAP', '0'))
+RAG_N_RESULTS = int(os.getenv('RAG_N_RESULTS', '3'))
+RAG_RERANK = os.getenv('RAG_RERANK', 'False') == 'True'
+RAG_PROMPT_BUDGET = int(os.getenv('RAG_PROMPT_BUDGET', '0'))  # u tokenima, 0 = bez ograničenja